@@ -1,8 +1,9 @@
-import math
+import functools
+import numpy as np
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Union, Dict, Literal
+from typing import List, Optional, Union, Literal, Tuple
 
 app = FastAPI(title="Yield Prediction API (Hardcoded Polygons + Pest Risk)")
 
@@ -40,26 +41,27 @@ def polygon_area_from_latlon(points: List[List[float]]) -> float:
     if len(points) < 3:
         return 0.0
 
-    lat_ref = sum(p[0] for p in points) / len(points)
-    lon_ref = points[0][1]
+    pts = np.asarray(points, dtype=np.float64)
+    lats = pts[:, 0]
+    lons = pts[:, 1]
 
-    lat_to_m = 111320
-    lon_to_m = 111320 * math.cos(math.radians(lat_ref))
+    lat_ref = lats.mean()
+    lon_ref = lons[0]
 
-    xy = []
-    for lat, lon in points:
-        xy.append([
-            (lon - lon_ref) * lon_to_m,
-            (lat - lat_ref) * lat_to_m
-        ])
+    lat_to_m = 111320.0
+    lon_to_m = 111320.0 * np.cos(np.radians(lat_ref))
 
-    area = 0
-    for i in range(len(xy)):
-        x1, y1 = xy[i]
-        x2, y2 = xy[(i + 1) % len(xy)]
-        area += x1 * y2 - x2 * y1
+    x = (lons - lon_ref) * lon_to_m
+    y = (lats - lat_ref) * lat_to_m
 
-    return abs(area * 0.5)
+    # Shoelace: sum(x_i * y_{i+1} - x_{i+1} * y_i)
+    area = np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)
+
+    return float(abs(area * 0.5))
+
+# Hardcoded polygons never change, so measure them once at import
+HARD_CODED_AREAS = [polygon_area_from_latlon(p) for p in HARD_CODED_POLYGONS]
+HARD_CODED_TOTAL_AREA = sum(HARD_CODED_AREAS)
 
 # =========================================================
 # MODELS
@@ -87,24 +89,57 @@ class AnalyzeDamageRequest(BaseModel):
     growth_stage: Optional[str] = "reproductive"
     soil_sensor_values: Optional[SoilSensorValues] = None
 
+class YieldPrediction(BaseModel):
+    per_plant_kg: float
+    predicted_yield_kg: float
+    lower_bound_kg: float
+    upper_bound_kg: float
+    hardcoded_pest_risk_score_used: float
+
+class AnalyzeDamageResponse(BaseModel):
+    farm_area_m2: float
+    total_plants: float
+
+    hardcoded_polygons_used: List[List[List[float]]]
+
+    damage_area_m2: float
+    lost_plants: float
+    remaining_plants: float
+
+    yield_prediction: YieldPrediction
+
+    pest_image_received: Optional[str] = None
+
 # =========================================================
 # YIELD LOGIC
 # =========================================================
 
-def compute_soil_fertility(soil: Optional[Dict]) -> float:
-    if not soil:
+# (pH, N_mg_per_kg, Moisture_percent) -- the only readings the score uses
+SoilKey = Tuple[Optional[float], Optional[float], Optional[float]]
+
+
+def soil_key(soil: Optional[SoilSensorValues]) -> Optional[SoilKey]:
+    if soil is None:
+        return None
+    return (soil.pH, soil.N_mg_per_kg, soil.Moisture_percent)
+
+
+@functools.lru_cache(maxsize=1024)
+def compute_soil_fertility(soil: Optional[SoilKey]) -> float:
+    if soil is None:
         return 0.5
 
+    ph, n, m = soil
+
     score = 1.0
-    if soil.get("pH") and 5.5 <= soil["pH"] <= 7.5:
+    if ph and 5.5 <= ph <= 7.5:
         score += 0.1
     else:
         score -= 0.1
 
-    if soil.get("N_mg_per_kg", 0) < 20:
+    if (n or 0) < 20:
         score -= 0.1
 
-    m = soil.get("Moisture_percent")
     if m is not None:
         if m < 20:
             score -= 0.1
@@ -117,7 +152,7 @@ def compute_soil_fertility(soil: Optional[Dict]) -> float:
 def predict_yield(
     surviving_plants: float,
     paddy_type: str,
-    soil: Optional[Dict],
+    soil: Optional[SoilKey],
     growth_stage: str
 ):
     base = 0.014
@@ -146,30 +181,23 @@ def predict_yield(
 # FINAL ENDPOINT
 # =========================================================
 
-@app.post("/analyze-damage")
-def analyze_damage(data: AnalyzeDamageRequest):
+@app.post("/analyze-damage", response_model=AnalyzeDamageResponse)
+async def analyze_damage(data: AnalyzeDamageRequest):
 
     plant_density = 1 / (data.row_spacing * data.plant_spacing)
     total_plants = plant_density * data.farm_area_m2
 
-    lost_plants = 0
-    total_damage_area = 0
-
-    # 🔥 IGNORE USER POLYGONS  
-    # ALWAYS use hardcoded polygons
-    for poly in HARD_CODED_POLYGONS:
-        area = polygon_area_from_latlon(poly)
-        total_damage_area += area
-        lost_plants += area * plant_density
+    # 🔥 IGNORE USER POLYGONS
+    # ALWAYS use hardcoded polygons (areas precomputed at import)
+    total_damage_area = HARD_CODED_TOTAL_AREA
+    lost_plants = total_damage_area * plant_density
 
     surviving = max(0, total_plants - lost_plants)
 
-    soil_vals = data.soil_sensor_values.dict() if data.soil_sensor_values else None
-
     yield_result = predict_yield(
         surviving_plants=surviving,
         paddy_type=data.paddy_type,
-        soil=soil_vals,
+        soil=soil_key(data.soil_sensor_values),
         growth_stage=data.growth_stage
     )
 